@@ -1,40 +1,56 @@
+from concurrent.futures import ThreadPoolExecutor
 from .downloader import GDCFileDownloader, IDCFileDownloader
 from .database import DatabaseManager
 
 
 class MINDS:
     def __init__(self):
-        self.db = DatabaseManager()
+        self._db = None
 
-    def query(self, query_string):
+    @property
+    def db(self):
+        """The database connection, created on first use."""
+        if self._db is None:
+            self._db = DatabaseManager()
+        return self._db
+
+    def query(self, query_string, params=None):
         """Query the database and return the result as a pandas dataframe
 
         Parameters
         ----------
         query_string : str
             The query string to be executed on the database
+        params : dict, optional
+            Values for ``:name`` placeholders in the query string, bound by the
+            driver instead of being formatted into the SQL
 
         Returns
         -------
         pandas.DataFrame
             The result of the query
         """
-        return self.db.execute(query_string)
+        return self.db.execute(query_string, params)
 
-    def get_cohort(self, query_string):
+    def get_cohort(self, query_string, params=None, distinct_in_db=False):
         """Query the database and return the case ids and case_submitter_ids as two lists
 
         Parameters
         ----------
         query_string : str
             The query string to be executed on the database
+        params : dict, optional
+            Values for ``:name`` placeholders in the query string
+        distinct_in_db : bool, optional
+            Wrap the query so the database returns each case_id and
+            case_submitter_id pair once, instead of one row per matching record
 
         Returns
         -------
         dataframe
             A df containing unique case_ids and their case_submitter_ids for a query
         """
-        return self.db.get_cohort(query_string)
+        return self.db.get_cohort(query_string, params, distinct_in_db)
 
     def download(self, cohort, output_dir):
         """Download the files for a given cohort
@@ -50,13 +66,27 @@ class MINDS:
         -------
         None
         """
-        case_ids = cohort.index.tolist()
-        case_submitter_ids = cohort.values.tolist()
+        # Convert numpy values to plain Python strings once, up front
+        case_ids = [str(case_id) for case_id in cohort.index.tolist()]
+        case_submitter_ids = [[str(x) for x in ids] for ids in cohort.values]
 
         gdc_download = GDCFileDownloader(output_dir)
-        gdc_download.process_cases(
-            case_ids=case_ids, case_submitter_ids=case_submitter_ids
-        )
-
         idc_download = IDCFileDownloader(output_dir)
+
+        # Fetch the IDC metadata while the GDC files download; the IDC files are
+        # only written once the GDC step has finished with the raw directory
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            idc_prefetch = executor.submit(
+                idc_download.prefetch, case_submitter_ids=case_submitter_ids
+            )
+            gdc_download.process_cases(
+                case_ids=case_ids, case_submitter_ids=case_submitter_ids
+            )
+            # The prefetch only warms the cache; process_cases requests any batch
+            # that is missing from it, so a failure here is not fatal
+            try:
+                idc_prefetch.result()
+            except Exception as e:
+                print(f"Failed to prefetch IDC metadata: {e}")
+
         idc_download.process_cases(case_submitter_ids=case_submitter_ids)
@@ -1,27 +1,55 @@
-from sqlalchemy import create_engine
+from functools import lru_cache
+from sqlalchemy import bindparam, create_engine, text
 import os
 import pandas as pd
 from dotenv import load_dotenv
 
 
+@lru_cache(maxsize=None)
+def _load_database_url():
+    """Read the connection settings from .env once per process."""
+    os.environ.pop("HOST", None)
+    os.environ.pop("DB_USER", None)
+    os.environ.pop("PASSWORD", None)
+    os.environ.pop("DATABASE", None)
+    load_dotenv()
+    host = os.getenv("HOST")
+    user = os.getenv("DB_USER")
+    password = os.getenv("PASSWORD")
+    database = os.getenv("DATABASE")
+    return f"mysql+pymysql://{user}:{password}@{host}/{database}"
+
+
 class DatabaseManager:
     def __init__(self):
-        os.environ.pop("HOST", None)
-        os.environ.pop("DB_USER", None)
-        os.environ.pop("PASSWORD", None)
-        os.environ.pop("DATABASE", None)
-        load_dotenv()
-        host = os.getenv("HOST")
-        user = os.getenv("DB_USER")
-        password = os.getenv("PASSWORD")
-        database = os.getenv("DATABASE")
-        database_url = f"mysql+pymysql://{user}:{password}@{host}/{database}"
-        self.engine = create_engine(database_url)
+        database_url = _load_database_url()
+        # The engine keeps a pool of connections; check them before use and
+        # recycle them before MySQL's idle timeout closes them server-side
+        self.engine = create_engine(
+            database_url, pool_pre_ping=True, pool_recycle=3600
+        )
 
-    def execute(self, query):
-        return pd.read_sql(query, self.engine)
+    def execute(self, query, params=None):
+        if params is not None:
+            # Bind values through the driver instead of formatting them into the
+            # SQL; list values expand in place so ``IN :ids`` takes a whole cohort
+            query = text(query).bindparams(
+                *(
+                    bindparam(name, expanding=True)
+                    for name, value in params.items()
+                    if isinstance(value, (list, tuple, set))
+                )
+            )
+        return pd.read_sql_query(query, self.engine, params=params)
 
-    def get_cohort(self, query):
-        df = self.execute(query)
+    def get_cohort(self, query, params=None, distinct_in_db=False):
+        if distinct_in_db:
+            # Let the server reduce the file-level rows to one per case and
+            # submitter id, so only those pairs cross the network
+            query = (
+                "SELECT DISTINCT case_id, case_submitter_id "
+                f"FROM ({query.strip().rstrip(';')}) AS cohort"
+            )
+        df = self.execute(query, params)
         cohort = df.groupby("case_id")["case_submitter_id"].unique()
         return cohort
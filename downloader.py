@@ -1,14 +1,171 @@
 import os
 import re
 import requests
-import json
+import hashlib
+import orjson
 import tarfile
 import shutil
+import subprocess
+import threading
 import time
+import urllib3
+from collections import defaultdict, deque
 from tqdm import tqdm
 from tqdm.contrib.concurrent import thread_map
-from google.cloud import storage
+from requests.adapters import HTTPAdapter
 from urllib.parse import urlparse
+from urllib3.util.retry import Retry
+
+CHUNK_SIZE = 1024 * 1024
+MAX_RETRIES = 8
+DONE_MARKER = ".done"
+# Every GDC bundle carries this file at its top level; concurrent extractions into
+# DATA_DIR would race on it, and nothing reads it, so it is never extracted
+BUNDLE_MANIFEST = "MANIFEST.txt"
+IDC_BATCH_SIZE = 100
+IDC_MAX_CONCURRENT_QUERIES = 4
+GDC_BATCH_SIZE = 200
+# Size and checksum are listed so files left by an interrupted run can be verified
+GDC_FILE_FIELDS = ("file_id", "file_name", "data_type", "md5sum", "file_size")
+CACHE_DIR = ".minds_http_cache"
+CACHE_TTL = 7 * 24 * 60 * 60
+CLEANUP_EXTENSIONS = (".gz", ".tar", ".txt")
+# Only the fields used by IDCFileDownloader.merge_data are requested
+IDC_QUERY_FIELDS = ("PatientID", "Modality")
+IDC_MANIFEST_PARAMS = dict(
+    sql=False,
+    Collection_ID=True,
+    Patient_ID=True,
+    StudyInstanceUID=True,
+    SeriesInstanceUID=True,
+    SOPInstanceUID=True,
+    Source_DOI=True,
+    CRDC_Study_GUID=True,
+    CRDC_Series_GUID=True,
+    CRDC_Instance_GUID=True,
+    GCS_URL=True,
+)
+RETRY = Retry(
+    total=MAX_RETRIES,
+    backoff_factor=1.0,
+    status_forcelist=[429, 500, 502, 503, 504],
+    allowed_methods=Retry.DEFAULT_ALLOWED_METHODS | {"POST"},
+    respect_retry_after_header=True,
+    raise_on_status=False,
+)
+
+
+def _batched(items, size):
+    """
+    Split a list into consecutive batches.
+
+    :param items: The list to split.
+    :param size: The maximum number of items per batch.
+    :return: Generator of lists with at most size items each.
+    """
+    for start in range(0, len(items), size):
+        yield items[start : start + size]
+
+
+def _dump_manifest(manifest, pretty=False):
+    """
+    Serialize manifest entries to JSON.
+
+    :param manifest: The list of manifest entries.
+    :param pretty: Indent the output for human inspection instead of writing it compactly.
+    :return: The serialized manifest as bytes.
+    """
+    return orjson.dumps(manifest, option=orjson.OPT_INDENT_2 if pretty else None)
+
+
+def _bundle_members(tar):
+    """
+    Iterate over the members of a GDC bundle, leaving out its MANIFEST.txt.
+
+    :param tar: The open tarfile, possibly in stream mode.
+    :return: Generator of the members to extract.
+    """
+    for member in tar:
+        if member.name != BUNDLE_MANIFEST:
+            yield member
+
+
+def _merge_directory(source, destination):
+    """
+    Move the contents of one directory into another that already exists.
+
+    Subdirectories present in both are merged recursively, and files in the
+    destination are replaced by the source's copy. The emptied source is removed.
+
+    :param source: The directory to move entries from.
+    :param destination: The existing directory to move entries into.
+    """
+    with os.scandir(source) as entries:
+        for entry in entries:
+            target = os.path.join(destination, entry.name)
+            if entry.is_dir() and os.path.isdir(target):
+                _merge_directory(entry.path, target)
+            else:
+                if os.path.isdir(target):
+                    shutil.rmtree(target)
+                os.replace(entry.path, target)
+    os.rmdir(source)
+
+
+class ResponseCache:
+    """
+    Cache of API responses stored as JSON files in a directory.
+    """
+
+    def __init__(self, directory, ttl=CACHE_TTL):
+        """
+        Initialize the cache in a specific directory.
+
+        :param directory: Directory where cached responses will be stored.
+        :param ttl: Number of seconds after which a cached response expires.
+        """
+        self.directory = directory
+        self.ttl = ttl
+
+    def _path(self, key):
+        digest = hashlib.sha1(orjson.dumps(key)).hexdigest()
+        return os.path.join(self.directory, f"{digest}.json")
+
+    def get(self, key):
+        """
+        Look up a cached response.
+
+        :param key: A JSON-serializable key identifying the request.
+        :return: The cached response, or None if it is missing or expired.
+        """
+        path = self._path(key)
+        try:
+            if time.time() - os.path.getmtime(path) > self.ttl:
+                return None
+            with open(path, "rb") as f:
+                return orjson.loads(f.read())
+        except (FileNotFoundError, orjson.JSONDecodeError):
+            return None
+
+    def set(self, key, value):
+        """
+        Store a response in the cache.
+
+        :param key: A JSON-serializable key identifying the request.
+        :param value: The JSON-serializable response to store.
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        path = self._path(key)
+        temp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(temp_path, "wb") as f:
+            f.write(orjson.dumps(value))
+        os.replace(temp_path, path)
+
+    def clear(self):
+        """
+        Remove all cached responses.
+        """
+        shutil.rmtree(self.directory, ignore_errors=True)
 
 
 class GDCFileDownloader:
@@ -16,80 +173,355 @@ class GDCFileDownloader:
     Class for downloading files from the GDC API based on case_ids.
     """
 
-    def __init__(self, DATA_DIR):
+    def __init__(
+        self,
+        DATA_DIR,
+        max_workers=None,
+        pretty_manifest=False,
+        cache_ttl=CACHE_TTL,
+        verify_md5=False,
+    ):
         """
         Initialize the downloader with a specific data directory.
 
         :param DATA_DIR: Directory where downloaded data will be stored.
+        :param max_workers: Number of cases processed concurrently, defaults to min(32, cpu_count + 4).
+        :param pretty_manifest: Write manifest.json indented instead of compact.
+        :param cache_ttl: Seconds a cached API response stays valid, defaults to a week.
+        :param verify_md5: Also compare the md5sum of files already on disk, not only their size.
         """
         self.BASE_URL = "https://api.gdc.cancer.gov/"
         self.FILES_ENDPOINT = "files"
         self.DATA_ENDPOINT = "data"
         self.DATA_DIR = DATA_DIR
+        self.MAX_WORKERS = max_workers or min(32, (os.cpu_count() or 1) + 4)
+        self.pretty_manifest = pretty_manifest
+        self.verify_md5 = verify_md5
+        self._case_files = {}
+        self.cache = ResponseCache(os.path.join(DATA_DIR, CACHE_DIR), cache_ttl)
+        # Every worker holds at most one connection to the GDC API at a time
+        self.session = requests.Session()
+        self.session.mount(
+            self.BASE_URL,
+            HTTPAdapter(
+                pool_connections=1,
+                pool_maxsize=self.MAX_WORKERS,
+                max_retries=RETRY,
+            ),
+        )
+        self.failed_case_ids = deque()
+        self._tar_command = self._native_tar_command()
 
-    def get_file_uuids_for_case_id(self, case_id):
+    def _mark_failed(self, case_id):
         """
-        Fetch file UUIDs from the GDC API based on a given case_id.
+        Record a case whose files could not be downloaded or extracted.
 
-        :param case_id: The ID of the case to fetch file UUIDs for.
-        :return: List of file UUIDs associated with the given case_id.
+        :param case_id: The ID of the case that failed.
+        """
+        self.failed_case_ids.append(case_id)
+
+    def _native_tar_command(self):
+        """
+        Build the command used to extract .tar.gz streams with the native tar binary.
+
+        :return: The tar command reading from stdin, or None if tar is not available.
+        """
+        tar = shutil.which("tar")
+        if tar is None:
+            return None
+        exclude = f"--exclude={BUNDLE_MANIFEST}"
+        if shutil.which("pigz"):
+            return [
+                tar,
+                exclude,
+                "--use-compress-program=pigz",
+                "-xf",
+                "-",
+                "-C",
+                self.DATA_DIR,
+            ]
+        return [tar, exclude, "-xzf", "-", "-C", self.DATA_DIR]
+
+    def prefetch_files(self, case_ids):
+        """
+        Fetch the file records for many case_ids with one request per batch.
+
+        Records are stored exactly as get_files_for_case_id would store them, so the
+        per-case download and organize steps then run without listing requests. Cases
+        in a batch that fails are left to get_files_for_case_id.
+
+        :param case_ids: List of case IDs to fetch file records for.
         """
-        params = {
-            "filters": json.dumps(
-                {
+        missing = []
+        for case_id in case_ids:
+            if case_id in self._case_files:
+                continue
+            files = self.cache.get(["gdc", "files", case_id, GDC_FILE_FIELDS])
+            if files is None:
+                missing.append(case_id)
+            else:
+                self._case_files[case_id] = files
+        for batch in _batched(missing, GDC_BATCH_SIZE):
+            body = {
+                "filters": {
                     "op": "and",
                     "content": [
                         {
-                            "op": "=",
-                            "content": {"field": "cases.case_id", "value": [case_id]},
+                            "op": "in",
+                            "content": {"field": "cases.case_id", "value": batch},
                         },
                         {"op": "=", "content": {"field": "access", "value": ["open"]}},
                     ],
-                }
-            ),
-            "fields": "file_id",
+                },
+                "fields": ",".join(GDC_FILE_FIELDS + ("cases.case_id",)),
+                "format": "JSON",
+                "size": 1_000_000,
+            }
+            try:
+                response = self.session.post(
+                    self.BASE_URL + self.FILES_ENDPOINT,
+                    data=orjson.dumps(body),
+                    headers={"Content-Type": "application/json"},
+                )
+                response.raise_for_status()
+            except requests.RequestException:
+                continue
+            files_by_case = {case_id: [] for case_id in batch}
+            for hit in orjson.loads(response.content)["data"]["hits"]:
+                record = {field: hit.get(field) for field in GDC_FILE_FIELDS}
+                for case in hit.get("cases", ()):
+                    if case["case_id"] in files_by_case:
+                        files_by_case[case["case_id"]].append(record)
+            for case_id, files in files_by_case.items():
+                self.cache.set(["gdc", "files", case_id, GDC_FILE_FIELDS], files)
+                self._case_files[case_id] = files
+
+    def get_files_for_case_id(self, case_id):
+        """
+        Fetch file records (file_id, file_name, data_type, md5sum and file_size) from the GDC API based on a given case_id.
+
+        Results are memoized so that the organize step reuses the records
+        fetched during the download step, and cached on disk across runs.
+
+        :param case_id: The ID of the case to fetch file records for.
+        :return: List of file records associated with the given case_id.
+        """
+        if case_id in self._case_files:
+            return self._case_files[case_id]
+        files = self.cache.get(["gdc", "files", case_id, GDC_FILE_FIELDS])
+        if files is not None:
+            self._case_files[case_id] = files
+            return files
+        body = {
+            "filters": {
+                "op": "and",
+                "content": [
+                    {
+                        "op": "=",
+                        "content": {"field": "cases.case_id", "value": [case_id]},
+                    },
+                    {"op": "=", "content": {"field": "access", "value": ["open"]}},
+                ],
+            },
+            "fields": ",".join(GDC_FILE_FIELDS),
             "format": "JSON",
-            "size": "1_000_000",
+            "size": 1_000_000,
         }
-        response = requests.get(self.BASE_URL + self.FILES_ENDPOINT, params=params)
-        return [entry["file_id"] for entry in response.json()["data"]["hits"]]
+        response = self.session.post(
+            self.BASE_URL + self.FILES_ENDPOINT,
+            data=orjson.dumps(body),
+            headers={"Content-Type": "application/json"},
+        )
+        response.raise_for_status()
+        files = orjson.loads(response.content)["data"]["hits"]
+        self.cache.set(["gdc", "files", case_id, GDC_FILE_FIELDS], files)
+        self._case_files[case_id] = files
+        return files
 
-    def download_files_for_case_id(self, case_id):
+    def get_file_uuids_for_case_id(self, case_id):
+        """
+        Fetch file UUIDs from the GDC API based on a given case_id.
+
+        :param case_id: The ID of the case to fetch file UUIDs for.
+        :return: List of file UUIDs associated with the given case_id.
+        """
+        return [entry["file_id"] for entry in self.get_files_for_case_id(case_id)]
+
+    def is_file_complete(self, directory, entry):
+        """
+        Check whether a file from the GDC listing is fully present on disk.
+
+        A file stored as <directory>/<file_id>/<file_name> counts only if its size
+        matches the listing, and its md5sum as well when verify_md5 is set, so
+        files truncated by an interrupted download are fetched again.
+
+        :param directory: The directory holding the <file_id> subdirectory.
+        :param entry: The file record from get_files_for_case_id.
+        :return: True if the file exists and matches the listing.
+        """
+        path = os.path.join(directory, entry["file_id"], entry["file_name"])
+        try:
+            if os.path.getsize(path) != entry["file_size"]:
+                return False
+        except OSError:
+            return False
+        if not self.verify_md5:
+            return True
+        md5 = hashlib.md5()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+                md5.update(chunk)
+        return md5.hexdigest() == entry["md5sum"]
+
+    def download_files_for_case_id(self, case_id, case_submitter_id=None):
         """
         Download all files associated with a given case_id.
 
+        Multi-file bundles arrive as a .tar.gz archive and are extracted into the
+        data directory while they stream in, without writing the archive to disk.
+
+        Files already present in the data directory, extracted, organized, or renamed
+        to the submitter ID by an earlier run, are not requested again if they pass
+        is_file_complete, and no request is made if nothing is missing.
+
         :param case_id: The ID of the case to download files for.
+        :param case_submitter_id: The submitter ID the case directory may have been renamed to.
+        :return: True if every missing file was downloaded and extracted.
         """
-        file_uuid_list = self.get_file_uuids_for_case_id(case_id)
-        response = requests.post(
+        raw_dir = os.path.join(self.DATA_DIR, "raw")
+        case_dirs = [os.path.join(raw_dir, case_id)]
+        if case_submitter_id is not None:
+            case_dirs.append(os.path.join(raw_dir, case_submitter_id))
+        file_uuid_list = [
+            entry["file_id"]
+            for entry in self.get_files_for_case_id(case_id)
+            if not self.is_file_complete(self.DATA_DIR, entry)
+            and not any(
+                self.is_file_complete(os.path.join(case_dir, entry["data_type"]), entry)
+                for case_dir in case_dirs
+            )
+        ]
+        if not file_uuid_list:
+            return True
+        with self.session.post(
             self.BASE_URL + self.DATA_ENDPOINT,
-            data=json.dumps({"ids": file_uuid_list}),
+            data=orjson.dumps({"ids": file_uuid_list}),
             headers={"Content-Type": "application/json"},
-        )
-        file_name = re.findall(
-            "filename=(.+)", response.headers["Content-Disposition"]
-        )[0]
-        file_extension = file_name.split(".")[-1]
-        os.makedirs(self.DATA_DIR, exist_ok=True)
-        output_path = os.path.join(self.DATA_DIR, f"{case_id}.{file_extension}")
-        with open(output_path, "wb") as output_file:
-            output_file.write(response.content)
+            stream=True,
+        ) as response:
+            response.raise_for_status()
+            file_name = re.findall(
+                "filename=(.+)", response.headers["Content-Disposition"]
+            )[0]
+            os.makedirs(self.DATA_DIR, exist_ok=True)
+            if len(file_uuid_list) > 1:
+                return self.extract_stream(case_id, response)
+            # A single file is sent as-is; store it the way a bundle would extract it.
+            output_dir = os.path.join(self.DATA_DIR, file_uuid_list[0])
+            os.makedirs(output_dir, exist_ok=True)
+            output_path = os.path.join(output_dir, os.path.basename(file_name))
+            with open(output_path, "wb", buffering=CHUNK_SIZE) as output_file:
+                for data in response.iter_content(chunk_size=CHUNK_SIZE):
+                    output_file.write(data)
+        return True
+
+    def extract_stream(self, case_id, response):
+        """
+        Extract a streaming .tar.gz response into the data directory as it is received.
+
+        The native tar binary is used when available, falling back to tarfile.
+
+        :param case_id: The ID of the case the archive belongs to.
+        :param response: The streaming response containing the archive.
+        :return: True if the whole archive was extracted.
+        """
+        response.raw.decode_content = True
+        try:
+            if self._tar_command is not None:
+                self._extract_with_native_tar(response.raw)
+            else:
+                with tarfile.open(fileobj=response.raw, mode="r|gz") as tar:
+                    tar.extractall(path=self.DATA_DIR, members=_bundle_members(tar))
+        except (
+            tarfile.TarError,
+            OSError,
+            subprocess.CalledProcessError,
+            urllib3.exceptions.HTTPError,
+        ):
+            self._mark_failed(case_id)
+            return False
+        return True
+
+    def _extract_with_native_tar(self, fileobj):
+        """
+        Pipe a .tar.gz stream into the native tar binary.
+
+        :param fileobj: The file-like object to read the archive from.
+        """
+        with subprocess.Popen(self._tar_command, stdin=subprocess.PIPE) as process:
+            shutil.copyfileobj(fileobj, process.stdin, CHUNK_SIZE)
+        if process.returncode != 0:
+            raise subprocess.CalledProcessError(process.returncode, self._tar_command)
 
     def extract_files(self, ext, mode):
         """
         Extract files with a given extension from the data directory.
 
         :param ext: The file extension to look for.
-        :param mode: The mode to use when opening the tarfile.
+        :param mode: The mode to use when opening the tarfile, e.g. "r|gz" to read
+            the archive as a forward-only stream.
         """
         for filename in os.listdir(self.DATA_DIR):
             if filename.endswith(ext):
-                filepath = os.path.join(self.DATA_DIR, filename)
-                with tarfile.open(filepath, mode) as tar:
-                    try:
-                        tar.extractall(path=self.DATA_DIR)
-                    except FileExistsError:
-                        pass
+                self._extract_one(filename, mode)
+
+    def _extract_one(self, filename, mode):
+        """
+        Extract a single archive from the data directory.
+
+        Members that already exist are overwritten, as the native tar binary does.
+        An archive that cannot be extracted is reported and skipped.
+
+        :param filename: The name of the archive in the data directory.
+        :param mode: The mode to use when opening the tarfile.
+        """
+        filepath = os.path.join(self.DATA_DIR, filename)
+        if os.path.getsize(filepath) == 0:
+            return
+        with open(filepath, "rb") as f:
+            # Missing or truncated members are downloaded again afterwards
+            try:
+                if mode == "r|gz" and self._tar_command is not None:
+                    # Hand the file straight to the native tar binary, which
+                    # decompresses outside the interpreter
+                    subprocess.run(self._tar_command, stdin=f, check=True)
+                else:
+                    self._extract_with_tarfile(f, mode)
+            except (tarfile.TarError, OSError, subprocess.CalledProcessError):
+                print(f"Failed to extract {filename}")
+            # Leftover archives are read once here and then removed by
+            # post_process_cleanup in the same process_cases call; drop them
+            # from the page cache now. Streamed bundles never reach this path.
+            if hasattr(os, "posix_fadvise"):
+                os.posix_fadvise(f.fileno(), 0, 0, os.POSIX_FADV_DONTNEED)
+
+    def _extract_with_tarfile(self, f, mode):
+        """
+        Extract an on-disk archive with tarfile, reading it in CHUNK_SIZE blocks.
+
+        Used by multi_extract at the start of process_cases for plain .tar archives,
+        and for .tar.gz archives on hosts without a native tar binary.
+
+        :param f: The open archive file.
+        :param mode: The mode to use when opening the tarfile.
+        """
+        with tarfile.open(
+            fileobj=f,
+            mode=mode,
+            bufsize=CHUNK_SIZE,
+            copybufsize=CHUNK_SIZE,
+        ) as tar:
+            tar.extractall(path=self.DATA_DIR, members=_bundle_members(tar))
 
     def organize_files(self, case_id):
         """
@@ -98,60 +530,96 @@ class GDCFileDownloader:
         :param case_id: The ID of the case to organize files for.
         """
         target_dir = os.path.join(self.DATA_DIR, "raw", case_id)
-        for file_uuid in self.get_file_uuids_for_case_id(case_id):
-            response = requests.get(
-                self.BASE_URL + self.FILES_ENDPOINT + "/" + file_uuid
-            )
-            if response.status_code == 200:
-                data_type = response.json()["data"]["data_type"]
-                os.makedirs(os.path.join(target_dir, data_type), exist_ok=True)
+        entries_by_type = defaultdict(list)
+        for entry in self.get_files_for_case_id(case_id):
+            entries_by_type[entry["data_type"]].append(entry)
+        for data_type, entries in entries_by_type.items():
+            data_type_dir = os.path.join(target_dir, data_type)
+            os.makedirs(data_type_dir, exist_ok=True)
+            for entry in entries:
+                source = os.path.join(self.DATA_DIR, entry["file_id"])
+                destination = os.path.join(data_type_dir, entry["file_id"])
+                if os.path.isdir(source) and os.path.isdir(destination):
+                    # Keep a verified copy from an earlier run, otherwise let the
+                    # fresh download replace the incomplete one
+                    if self.is_file_complete(data_type_dir, entry):
+                        shutil.rmtree(source)
+                        continue
+                    shutil.rmtree(destination)
                 try:
-                    shutil.move(
-                        os.path.join(self.DATA_DIR, file_uuid),
-                        os.path.join(target_dir, data_type, file_uuid),
-                    )
-                except (FileNotFoundError, FileExistsError, shutil.Error):
+                    os.replace(source, destination)
+                except FileNotFoundError:
                     pass
-            elif response.status_code == 429:
-                time.sleep(30)
-                self.organize_files(case_id)
+                except OSError:
+                    try:
+                        shutil.move(source, destination)
+                    except (FileNotFoundError, FileExistsError, shutil.Error):
+                        pass
 
     def generate_manifest(self):
         """
         Generate a manifest.json file in the data directory that logs all files in the /raw subdirectory.
         """
+        self.save_manifest(self.build_manifest())
+
+    def build_manifest(self):
+        """
+        Build the manifest entries for all files in the /raw subdirectory without writing them.
+
+        :return: The list of manifest entries.
+        """
         manifest = []
         raw_dir = os.path.join(self.DATA_DIR, "raw")
-        for case_id in os.listdir(raw_dir):
-            case_dir = os.path.join(raw_dir, case_id)
-            if not os.path.isdir(case_dir):
-                continue
-            case_manifest = {"case_id": case_id}
-            for data_type in os.listdir(case_dir):
-                data_type_dir = os.path.join(case_dir, data_type)
-                data_manifest = []
-                for filename in os.listdir(data_type_dir):
-                    file_uuid = os.path.splitext(filename)[0]
-                    data_manifest.append(file_uuid)
-                case_manifest[data_type] = data_manifest
-            manifest.append(case_manifest)
-        with open(os.path.join(self.DATA_DIR, "manifest.json"), "w") as f:
-            json.dump(manifest, f, indent=4)
+        # scandir entries carry the file type from the directory listing, so the
+        # is_dir checks do not need a stat call per entry
+        with os.scandir(raw_dir) as case_entries:
+            for case_entry in case_entries:
+                if not case_entry.is_dir():
+                    continue
+                case_manifest = {"case_id": case_entry.name}
+                with os.scandir(case_entry.path) as data_type_entries:
+                    for data_type_entry in data_type_entries:
+                        if not data_type_entry.is_dir():
+                            continue
+                        case_manifest[data_type_entry.name] = [
+                            os.path.splitext(filename)[0]
+                            for filename in os.listdir(data_type_entry.path)
+                        ]
+                # A case without open-access files only holds its completion marker
+                if len(case_manifest) > 1:
+                    manifest.append(case_manifest)
+        return manifest
+
+    def save_manifest(self, manifest):
+        """
+        Write manifest.json to the data directory.
+
+        :param manifest: The list of manifest entries to write.
+        """
+        manifest_path = os.path.join(self.DATA_DIR, "manifest.json")
+        with open(manifest_path, "wb") as f:
+            f.write(_dump_manifest(manifest, self.pretty_manifest))
 
     def post_process_cleanup(self):
         """
         Clean up the data directory by removing all .gz, .tar, and .txt files.
         """
-        for filename in tqdm(os.listdir(self.DATA_DIR)):
-            if (
-                filename.endswith(".gz")
-                or filename.endswith(".tar")
-                or filename.endswith(".txt")
-            ):
+        for filename in os.listdir(self.DATA_DIR):
+            if filename.endswith(CLEANUP_EXTENSIONS):
                 filepath = os.path.join(self.DATA_DIR, filename)
                 os.remove(filepath)
 
-    def rename(self, case_ids, case_submitter_ids):
+    def rename_case_directories(self, case_ids, case_submitter_ids):
+        """
+        Rename case directories under /raw from case_ids to case_submitter_ids.
+
+        A directory that already exists under the submitter ID, from an earlier run or
+        from IDC files, is merged with the case_id directory instead.
+
+        :param case_ids: List of case IDs to rename.
+        :param case_submitter_ids: List of case submitter IDs, aligned with case_ids.
+        :return: Dict mapping each case_id to its case_submitter_id.
+        """
         raw_data_path = os.path.join(self.DATA_DIR, "raw")
 
         # Create a mapping of case_ids to their corresponding case_submitter_ids
@@ -163,12 +631,31 @@ class GDCFileDownloader:
             case_submitter_id_path = os.path.join(raw_data_path, case_submitter_id)
 
             if os.path.exists(case_id_path):
-                os.rename(case_id_path, case_submitter_id_path)
+                if os.path.isdir(case_submitter_id_path):
+                    # A previous run already renamed this case, or IDC files were
+                    # saved under the submitter ID; merge the new files into it
+                    _merge_directory(case_id_path, case_submitter_id_path)
+                else:
+                    os.rename(case_id_path, case_submitter_id_path)
 
-        # Reading manifest.json
-        manifest_path = os.path.join(self.DATA_DIR, "manifest.json")
-        with open(manifest_path, "r") as f:
-            manifest_data = json.load(f)
+        return case_mapping
+
+    def rename(self, case_ids, case_submitter_ids, manifest=None):
+        """
+        Rename case directories and manifest entries from case_ids to case_submitter_ids.
+
+        :param case_ids: List of case IDs to rename.
+        :param case_submitter_ids: List of case submitter IDs, aligned with case_ids.
+        :param manifest: Manifest entries to update and write, read from manifest.json if omitted.
+        """
+        case_mapping = self.rename_case_directories(case_ids, case_submitter_ids)
+
+        # Reading manifest.json, unless the caller already has the entries in memory
+        manifest_data = manifest
+        if manifest_data is None:
+            manifest_path = os.path.join(self.DATA_DIR, "manifest.json")
+            with open(manifest_path, "rb") as f:
+                manifest_data = orjson.loads(f.read())
 
         # Updating case_id in manifest.json
         for item in manifest_data:
@@ -177,8 +664,7 @@ class GDCFileDownloader:
                 item["case_id"] = case_mapping[old_case_id]
 
         # Writing updated manifest.json
-        with open(manifest_path, "w") as f:
-            json.dump(manifest_data, f, indent=4)
+        self.save_manifest(manifest_data)
 
     def multi_download(self, case_ids):
         """
@@ -186,16 +672,28 @@ class GDCFileDownloader:
 
         :param case_ids: List of case IDs to download files for.
         """
-        thread_map(self.download_files_for_case_id, case_ids)
+        thread_map(
+            self.download_files_for_case_id, case_ids, max_workers=self.MAX_WORKERS
+        )
 
     def multi_extract(self):
         """
         Concurrently extract all .gz and .tar files in the data directory.
+
+        Each archive is extracted by its own worker rather than one worker per
+        extension, so decompression is spread over all archives.
         """
+        archives = [
+            (filename, "r|gz" if filename.endswith(".gz") else "r|")
+            for filename in os.listdir(self.DATA_DIR)
+            if filename.endswith((".gz", ".tar"))
+        ]
+        if not archives:
+            return
         thread_map(
-            lambda ext, mode: self.extract_files(ext, mode),
-            [".gz", ".tar"],
-            ["r:gz", "r"],
+            lambda archive: self._extract_one(*archive),
+            archives,
+            max_workers=self.MAX_WORKERS,
         )
 
     def multi_organize(self, case_ids):
@@ -204,49 +702,135 @@ class GDCFileDownloader:
 
         :param case_ids: List of case IDs to organize files for.
         """
-        thread_map(self.organize_files, case_ids)
+        thread_map(self.organize_files, case_ids, max_workers=self.MAX_WORKERS)
+
+    def process_case(self, case_id, case_submitter_id=None):
+        """
+        Download, extract, and organize the files for a single case_id.
+
+        :param case_id: The ID of the case to process.
+        :param case_submitter_id: The submitter ID the case directory may have been renamed to.
+        """
+        try:
+            downloaded = self.download_files_for_case_id(case_id, case_submitter_id)
+        except requests.RequestException:
+            self._mark_failed(case_id)
+            return
+        self.organize_files(case_id)
+        if downloaded:
+            target_dir = os.path.join(self.DATA_DIR, "raw", case_id)
+            os.makedirs(target_dir, exist_ok=True)
+            open(os.path.join(target_dir, DONE_MARKER), "w").close()
+
+    def is_case_complete(self, case_id, case_submitter_id=None):
+        """
+        Check whether a case was fully processed by a previous run.
+
+        :param case_id: The ID of the case to check.
+        :param case_submitter_id: The submitter ID the case directory may have been renamed to.
+        :return: True if the case directory carries a completion marker.
+        """
+        raw_dir = os.path.join(self.DATA_DIR, "raw")
+        names = [case_id] if case_submitter_id is None else [case_id, case_submitter_id]
+        return any(
+            os.path.exists(os.path.join(raw_dir, name, DONE_MARKER)) for name in names
+        )
 
-    def process_cases(self, case_ids, case_submitter_ids):
+    def multi_process(self, case_ids, case_submitter_ids=None):
+        """
+        Concurrently download, extract, and organize files for multiple case_ids.
+
+        Each case moves through the pipeline independently, so the download of one
+        case overlaps with the extraction and organization of others.
+
+        :param case_ids: List of case IDs to process.
+        :param case_submitter_ids: Submitter IDs, aligned with case_ids, the case directories may have been renamed to.
+        """
+        if case_submitter_ids is None:
+            case_submitter_ids = [None] * len(case_ids)
+        thread_map(
+            self.process_case,
+            case_ids,
+            case_submitter_ids,
+            max_workers=self.MAX_WORKERS,
+        )
+
+    def process_cases(self, case_ids, case_submitter_ids, force_refresh=False):
         """
         Process a list of case_ids by downloading, extracting, organizing, and cleaning up files.
 
+        Archives left in the data directory by an interrupted run are extracted first.
+        Cases completed by a previous run are skipped without contacting the GDC API.
+
         :param case_ids: List of case IDs to process.
+        :param force_refresh: Discard cached API responses before processing.
         """
-        self.multi_download(case_ids)
+        if force_refresh:
+            self.cache.clear()
+        os.makedirs(self.DATA_DIR, exist_ok=True)
+        # Unpack archives an interrupted run left in the data directory, so their
+        # files are organized below instead of being requested again
         self.multi_extract()
-        self.multi_organize(case_ids)
+        # Drop duplicate case_ids, keeping the first occurrence and its submitter ID
+        cases = {}
+        for case_id, case_submitter_id in zip(case_ids, case_submitter_ids):
+            cases.setdefault(case_id, case_submitter_id)
+        case_ids, case_submitter_ids = list(cases), list(cases.values())
+        pending_cases = {
+            case_id: str(case_submitter_id[0])
+            for case_id, case_submitter_id in zip(case_ids, case_submitter_ids)
+            if not self.is_case_complete(case_id, str(case_submitter_id[0]))
+        }
+        self.prefetch_files(list(pending_cases))
+        self.multi_process(list(pending_cases), list(pending_cases.values()))
         self.post_process_cleanup()
-        self.generate_manifest()
-        self.rename(case_ids, case_submitter_ids)
+        # Merge retried cases into their renamed directories before listing them,
+        # so every case appears in the manifest once, under its submitter ID
+        self.rename_case_directories(case_ids, case_submitter_ids)
+        self.save_manifest(self.build_manifest())
+        if self.failed_case_ids:
+            print(f"Failed to download files for cases: {list(self.failed_case_ids)}")
 
 
 class IDCFileDownloader:
-    def __init__(self, save_directory):
+    def __init__(
+        self,
+        save_directory,
+        max_workers=None,
+        pretty_manifest=False,
+        cache_ttl=CACHE_TTL,
+    ):
         self.idc_api_preamble = "https://api.imaging.datacommons.cancer.gov/v1"
         self.save_directory = save_directory
+        self.MAX_WORKERS = max_workers or min(32, (os.cpu_count() or 1) + 4)
+        self.pretty_manifest = pretty_manifest
+        self.cache = ResponseCache(os.path.join(save_directory, CACHE_DIR), cache_ttl)
+        self._gcs_client = None
+        self.session = requests.Session()
+        self.session.headers.update({"Accept": "application/json"})
+        self.session.mount(self.idc_api_preamble, HTTPAdapter(max_retries=RETRY))
 
     def make_api_call(self, url, params, body):
-        response = requests.post(url, params=params, json=body)
+        cache_key = ["idc", url, params, body]
+        cached = self.cache.get(cache_key)
+        if cached is not None:
+            return cached
+        response = self.session.post(
+            url,
+            params=params,
+            data=orjson.dumps(body),
+            headers={"Content-Type": "application/json"},
+        )
         if response.status_code != 200:
             print(f"Request failed: {response.reason}")
             return None
-        return response.json()
+        data = orjson.loads(response.content)
+        self.cache.set(cache_key, data)
+        return data
 
     def get_manifest_preview(self, filters):
         url = f"{self.idc_api_preamble}/cohorts/manifest/preview"
-        params = dict(
-            sql=False,
-            Collection_ID=True,
-            Patient_ID=True,
-            StudyInstanceUID=True,
-            SeriesInstanceUID=True,
-            SOPInstanceUID=True,
-            Source_DOI=True,
-            CRDC_Study_GUID=True,
-            CRDC_Series_GUID=True,
-            CRDC_Instance_GUID=True,
-            GCS_URL=True,
-        )
+        params = IDC_MANIFEST_PARAMS
         body = {
             "name": "testingcohort",
             "description": "Test description",
@@ -264,59 +848,7 @@ class IDCFileDownloader:
             "description": "Test description",
             "filters": filters,
         }
-        queryFields = {
-            "fields": [
-                "Modality",
-                "BodyPartExamined",
-                "StudyDescription",
-                "StudyInstanceUID",
-                "PatientID",
-                "Program",
-                "SeriesInstanceUID",
-                "SOPInstanceUID",
-                "SeriesDescription",
-                "SliceThickness",
-                "SeriesNumber",
-                "StudyDate",
-                "SOPClassUID",
-                "collection_id",
-                "AnatomicRegionSequence",
-                "SegmentedPropertyCategoryCodeSequence",
-                "SegmentedPropertyTypeCodeSequence",
-                "FrameOfReferenceUID",
-                "SegmentNumber",
-                "SegmentAlgorithmType",
-                "SUVbw",
-                "Volume",
-                "Diameter",
-                "Surface_area_of",
-                "Total_Lesion_Glycolysis",
-                "Standardized_Added_Metabolic_Activity",
-                "Percent_Within_First_Quarter_of_Intensity_Range",
-                "Percent_Within_Third_Quarter_of_Intensity_Range",
-                "Percent_Within_Fourth_Quarter_of_Intensity_Range",
-                "Percent_Within_Second_Quarter_of_Intensity_Range",
-                "Standardized_Added_Metabolic_Activity_Background",
-                "Glycolysis_Within_First_Quarter_of_Intensity_Range",
-                "Glycolysis_Within_Third_Quarter_of_Intensity_Range",
-                "Glycolysis_Within_Fourth_Quarter_of_Intensity_Range",
-                "Glycolysis_Within_Second_Quarter_of_Intensity_Range",
-                "Internal_structure",
-                "Sphericity",
-                "Calcification",
-                "Lobular_Pattern",
-                "Spiculation",
-                "Margin",
-                "Texture",
-                "Subtlety_score",
-                "Malignancy",
-                "Apparent_Diffusion_Coefficient",
-                "tcia_species",
-                "Manufacturer",
-                "ManufacturerModelName",
-                "license_short_name",
-            ]
-        }
+        queryFields = {"fields": list(IDC_QUERY_FIELDS)}
         body = {
             "cohort_def": cohort_def,
             "queryFields": queryFields,
@@ -325,29 +857,21 @@ class IDCFileDownloader:
 
     def merge_data(self, manifest_data, query_data):
         merged_data = []
+        # (Patient_ID, GCS_URL, Modality) of every merged entry, for O(1) dedupe
+        seen = set()
+        manifest_entries = manifest_data.get("manifest", {}).get("json_manifest", [])
 
         # Create dictionaries to hold lists of entries for each Patient_ID
-        manifest_dict = {}
-        query_dict = {}
+        manifest_dict = defaultdict(list)
+        query_dict = defaultdict(list)
 
         # Populate manifest_dict
-        for manifest_entry in tqdm(
-            manifest_data.get("manifest", {}).get("json_manifest", []),
-            desc="Processing manifest",
-        ):
-            patient_id = manifest_entry.get("Patient_ID")
-            if patient_id not in manifest_dict:
-                manifest_dict[patient_id] = []
-            manifest_dict[patient_id].append(manifest_entry)
+        for manifest_entry in manifest_entries:
+            manifest_dict[manifest_entry.get("Patient_ID")].append(manifest_entry)
 
         # Populate query_dict
-        for query_entry in tqdm(
-            query_data.get("query_results", {}).get("json", []), desc="Processing query"
-        ):
-            patient_id = query_entry.get("PatientID")
-            if patient_id not in query_dict:
-                query_dict[patient_id] = []
-            query_dict[patient_id].append(query_entry)
+        for query_entry in query_data.get("query_results", {}).get("json", []):
+            query_dict[query_entry.get("PatientID")].append(query_entry)
 
         # Merge the data
         for patient_id, manifest_entries in tqdm(
@@ -357,19 +881,43 @@ class IDCFileDownloader:
                 query_entries = query_dict[patient_id]
                 for manifest_entry in manifest_entries:
                     for query_entry in query_entries:
-                        merged_entry = {
-                            "Patient_ID": patient_id,
-                            "GCS_URL": manifest_entry.get("GCS_URL"),
-                            "Modality": query_entry.get("Modality"),
-                        }
-                        if merged_entry not in merged_data:
-                            merged_data.append(merged_entry)
+                        key = (
+                            patient_id,
+                            manifest_entry.get("GCS_URL"),
+                            query_entry.get("Modality"),
+                        )
+                        if key not in seen:
+                            seen.add(key)
+                            merged_data.append(
+                                {
+                                    "Patient_ID": key[0],
+                                    "GCS_URL": key[1],
+                                    "Modality": key[2],
+                                }
+                            )
         return merged_data
 
+    def get_gcs_client(self):
+        """Return the anonymous GCS client, created once and shared by all downloads."""
+        if self._gcs_client is None:
+            from google.cloud import storage
+
+            client = storage.Client.create_anonymous_client()
+            # Keep one pooled connection per worker instead of the default ten,
+            # so no worker has to open a fresh TLS connection for each blob
+            client._http.mount(
+                "https://",
+                HTTPAdapter(
+                    pool_connections=1, pool_maxsize=max(self.MAX_WORKERS, 10)
+                ),
+            )
+            self._gcs_client = client
+        return self._gcs_client
+
     def download_dicom_files(self, merged_data):
-        client = storage.Client.create_anonymous_client()
+        client = self.get_gcs_client()
 
-        for entry in tqdm(merged_data, desc="Downloading Files"):
+        def download_entry(entry):
             gcs_url = entry.get("GCS_URL")
             parsed_url = urlparse(gcs_url)
             bucket_name = parsed_url.netloc
@@ -390,46 +938,89 @@ class IDCFileDownloader:
             # Download the blob to the local file
             blob.download_to_filename(save_path)
 
+        # Each DICOM instance is a small object, so the download is dominated by
+        # request latency; keep several requests in flight at once
+        thread_map(
+            download_entry,
+            merged_data,
+            max_workers=self.MAX_WORKERS,
+            desc="Downloading Files",
+        )
+
     def update_manifest(self, merged_data):
         manifest_path = os.path.join(self.save_directory, "manifest.json")
 
         # Read existing manifest
         try:
-            with open(manifest_path, "r") as f:
-                manifest_data = json.load(f)
+            with open(manifest_path, "rb") as f:
+                manifest_data = orjson.loads(f.read())
         except FileNotFoundError:
             manifest_data = []
 
-        # Create a dictionary for faster look-up
+        # Create dictionaries for faster look-up of entries and their listed folders
         manifest_dict = {item.get("case_id"): item for item in manifest_data}
+        listed_folders = {}
         for entry in merged_data:
             patient_id = entry.get("Patient_ID")
             modality = entry.get("Modality")
             gcs_url = entry.get("GCS_URL")
             parsed = urlparse(gcs_url)
             folder_name = parsed.path.strip("/").split("/")[-2]
-            if patient_id in manifest_dict:
-                manifest_entry = manifest_dict[patient_id]
-                if modality not in manifest_entry:
-                    manifest_entry[modality] = []
-                if folder_name not in manifest_entry[modality]:
-                    manifest_entry[modality].append(folder_name)
-            else:
-                new_entry = {"case_id": patient_id, modality: [folder_name]}
-                manifest_data.append(new_entry)
-                manifest_dict[
-                    patient_id
-                ] = new_entry  # Update manifest_dict with the new entry
+            manifest_entry = manifest_dict.get(patient_id)
+            if manifest_entry is None:
+                manifest_entry = {"case_id": patient_id}
+                manifest_data.append(manifest_entry)
+                manifest_dict[patient_id] = manifest_entry
+            folders = manifest_entry.setdefault(modality, [])
+            key = (patient_id, modality)
+            if key not in listed_folders:
+                listed_folders[key] = set(folders)
+            if folder_name not in listed_folders[key]:
+                listed_folders[key].add(folder_name)
+                folders.append(folder_name)
 
         # Save the updated manifest back to disk
-        with open(manifest_path, "w") as f:
-            json.dump(manifest_data, f, indent=4)
+        with open(manifest_path, "wb") as f:
+            f.write(_dump_manifest(manifest_data, self.pretty_manifest))
 
-    def process_cases(self, case_submitter_ids):
-        case_submitter_ids = [x[0] for x in case_submitter_ids]
-        filters = {"PatientID": case_submitter_ids}
+    def get_previews(self, patient_ids):
+        filters = {"PatientID": patient_ids}
         manifest_data = self.get_manifest_preview(filters)
+        if manifest_data is None:
+            return None, None
         query_data = self.get_query_preview(filters)
-        merged_data = self.merge_data(manifest_data, query_data)
-        self.download_dicom_files(merged_data)
+        # Without the query results the modality of each file is unknown
+        if query_data is None:
+            return None, None
+        return manifest_data, query_data
+
+    def get_merged_data(self, patient_ids):
+        manifest_data, query_data = self.get_previews(patient_ids)
+        if manifest_data is None:
+            return []
+        return self.merge_data(manifest_data, query_data)
+
+    def prefetch(self, case_submitter_ids):
+        """Fetch and cache the IDC previews for a cohort without downloading any files."""
+        case_submitter_ids = [x[0] for x in case_submitter_ids]
+        # A few batches are requested at once; this runs next to the GDC
+        # downloads, so it stays quiet instead of drawing its own progress bar
+        thread_map(
+            self.get_previews,
+            list(_batched(case_submitter_ids, IDC_BATCH_SIZE)),
+            max_workers=IDC_MAX_CONCURRENT_QUERIES,
+            disable=True,
+        )
+
+    def process_cases(self, case_submitter_ids, force_refresh=False):
+        if force_refresh:
+            self.cache.clear()
+        case_submitter_ids = [x[0] for x in case_submitter_ids]
+        merged_data = []
+        # Each batch is downloaded as soon as it is merged, so only one batch of
+        # API responses is held in memory at a time
+        for patient_ids in _batched(case_submitter_ids, IDC_BATCH_SIZE):
+            batch_data = self.get_merged_data(patient_ids)
+            self.download_dicom_files(batch_data)
+            merged_data.extend(batch_data)
         self.update_manifest(merged_data)
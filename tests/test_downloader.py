@@ -0,0 +1,106 @@
+import hashlib
+import io
+import os
+import tarfile
+
+import orjson
+import pytest
+
+from downloader import GDCFileDownloader
+
+CASE_ID = "C1"
+SUBMITTER_ID = "S1"
+FILES = {"f1": os.urandom(1000), "f2": os.urandom(300_000)}
+ENTRIES = [
+    {
+        "file_id": file_id,
+        "file_name": f"{file_id}.bin",
+        "data_type": "DT",
+        "md5sum": hashlib.md5(content).hexdigest(),
+        "file_size": len(content),
+    }
+    for file_id, content in FILES.items()
+]
+
+
+class FakeResponse:
+    def __init__(self, body, filename):
+        self.raw = io.BytesIO(body)
+        self.headers = {"Content-Disposition": f"attachment; filename={filename}"}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    def raise_for_status(self):
+        pass
+
+    def iter_content(self, chunk_size):
+        return iter(lambda: self.raw.read(chunk_size), b"")
+
+
+class FakeSession:
+    """Serves /data requests the way the GDC API does, optionally cut short."""
+
+    def __init__(self, truncate=False):
+        self.truncate = truncate
+        self.requested = []
+
+    def post(self, url, data, headers, stream=False):
+        ids = orjson.loads(data)["ids"]
+        self.requested.append(ids)
+        if len(ids) == 1:
+            return FakeResponse(FILES[ids[0]], f"{ids[0]}.bin")
+        buffer = io.BytesIO()
+        with tarfile.open(fileobj=buffer, mode="w:gz") as tar:
+            for file_id in ["MANIFEST.txt"] + ids:
+                content = b"manifest" if file_id == "MANIFEST.txt" else FILES[file_id]
+                name = file_id if file_id == "MANIFEST.txt" else f"{file_id}/{file_id}.bin"
+                info = tarfile.TarInfo(name)
+                info.size = len(content)
+                tar.addfile(info, io.BytesIO(content))
+        body = buffer.getvalue()
+        if self.truncate:
+            # The connection drops halfway through the second file
+            body = body[: len(body) // 2]
+        return FakeResponse(body, "bundle.tar.gz")
+
+
+def run(data_dir, session, native_tar):
+    downloader = GDCFileDownloader(str(data_dir), max_workers=2)
+    downloader._case_files[CASE_ID] = ENTRIES
+    downloader.session = session
+    if not native_tar:
+        downloader._tar_command = None
+    downloader.process_cases([CASE_ID], [[SUBMITTER_ID]])
+    with open(os.path.join(data_dir, "manifest.json"), "rb") as f:
+        return downloader, orjson.loads(f.read())
+
+
+@pytest.mark.parametrize("native_tar", [True, False])
+def test_failed_case_is_completed_by_rerun(tmp_path, native_tar):
+    downloader, _ = run(tmp_path, FakeSession(truncate=True), native_tar)
+    assert list(downloader.failed_case_ids) == [CASE_ID]
+    assert not downloader.is_case_complete(CASE_ID, SUBMITTER_ID)
+
+    # IDC files land under the submitter ID between the runs
+    series_dir = tmp_path / "raw" / SUBMITTER_ID / "CT" / "series"
+    series_dir.mkdir(parents=True)
+    (series_dir / "instance.dcm").write_bytes(b"dicom")
+
+    session = FakeSession()
+    downloader, manifest = run(tmp_path, session, native_tar)
+    # f1 was complete before the connection dropped and now lives under raw/S1
+    assert session.requested == [["f2"]]
+    assert not downloader.failed_case_ids
+    assert downloader.is_case_complete(CASE_ID, SUBMITTER_ID)
+    assert len(manifest) == 1
+    assert manifest[0]["case_id"] == SUBMITTER_ID
+    assert sorted(manifest[0]["DT"]) == ["f1", "f2"]
+    assert manifest[0]["CT"] == ["series"]
+    for file_id, content in FILES.items():
+        path = tmp_path / "raw" / SUBMITTER_ID / "DT" / file_id / f"{file_id}.bin"
+        assert path.read_bytes() == content
+    assert not (tmp_path / "MANIFEST.txt").exists()